@@ -4,11 +4,12 @@ import sys
 import traceback
 from datetime import datetime
 from enum import Enum, unique
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Dict, List, Optional
 from urllib.error import URLError
 from urllib.parse import urlunparse
 from urllib.request import Request, urlopen
 
+from order_metrics import OrderMetricsAggregator
 from sale_prediction import Sale, SalePredictor
 
 
@@ -324,7 +325,7 @@ class InventoryLevelsUpdater(_FaireObj):
 
 class OrderProcessor:
 
-    def __init__(self, api_key: str, brand: str):
+    def __init__(self, api_key: str, brand: str, top_k_capacity: Optional[int] = None):
         self._request = _FaireRequest(api_key)
 
         self.brand = brand
@@ -332,6 +333,10 @@ class OrderProcessor:
         if self.brand is not None:
             products = list(filter(lambda product: product.brand_id == self.brand, products))
         self.products_dict: Dict[str, Product] = {product.id: product for product in products}
+        if top_k_capacity is None:
+            # One counter per known product option keeps the best selling count exact
+            top_k_capacity = max(1, sum(len(product.options_dict) for product in self.products_dict.values()))
+        self.metrics = OrderMetricsAggregator(top_k_capacity)
         self.orders: List[Order] = self._consume_item(Order.ITEM_TYPE)
 
     def process_orders(self):
@@ -362,11 +367,16 @@ class OrderProcessor:
         if item_type == Product.ITEM_TYPE:
             return [Product(item) for item in Product.get_all_items(self._request)]
         if item_type == Order.ITEM_TYPE:
-            return [Order(item) for item in Order.get_all_items(self._request)]
+            return [self._parse_order(item) for item in Order.get_all_items(self._request)]
         # TODO implement exception handling
         print("Not known item type {}".format(item_type))
         raise Exception
 
+    def _parse_order(self, parsed_obj: Dict) -> Order:
+        order = Order(parsed_obj)
+        self.metrics.add_order(order)
+        return order
+
     def _filter_and_sort_orders_by_creation(self) -> List[Order]:
         orders_to_process = list(filter(lambda order: order.is_new(), self.orders))
         orders_to_process = sorted(orders_to_process, key=lambda order: order.created_at)
@@ -389,6 +399,7 @@ class OrderProcessor:
         if not items_to_backorder:
             self._update_inventory_levels(po_quantity_to_update)
             order.accept_order(self._request)
+            self.metrics.add_sale(order)
         else:
             order.backorder_items(items_to_backorder, self._request)
 
@@ -407,38 +418,27 @@ class OrderProcessor:
         self._print_ratio_of_cancelled_orders()
 
     def _print_best_selling_product_option(self):
-        products_options_sell_info = {}
-        for order in list(filter(lambda o: o.is_sold(), self.orders)):
-            for order_item in order.items_dict.values():
-                product_option = self.products_dict[order_item.product_id].options_dict[order_item.product_option_id]
-                count = products_options_sell_info.setdefault(product_option, 0)
-                products_options_sell_info[product_option] = count + order_item.quantity
-        best_selling, number = self._sort_and_get_first(products_options_sell_info, True)
+        best_selling, number = self.metrics.product_options_sold.first()
         if best_selling is None:
             print("No products sold yet")
         else:
+            product_id, product_option_id = best_selling
+            product_option = self.products_dict[product_id].options_dict[product_option_id]
             print("Best selling product has id \"{}\" and name \"{}\". Sold {} units".format(
-                best_selling.id, (lambda n: n if n is not None else "")(best_selling.name), number))
+                product_option.id, (lambda n: n if n is not None else "")(product_option.name), number))
 
     def _print_largest_order_dollar_amount(self):
         # I think that only sold orders should be taken into account
-        orders_dollar_amount = {}
-        for order in list(filter(lambda o: o.is_sold(), self.orders)):
-            orders_dollar_amount[order] = order.calculate_order_dollar_amount()
-        largest_order, dollar_amount = self._sort_and_get_first(orders_dollar_amount, True)
-        if largest_order is None:
+        largest_order = self.metrics.largest_order_dollar_amount
+        if largest_order.key is None:
             print("No orders sold yet")
         else:
-            print("Largest order dollar amount has id \"{}\". Value is {} dollars".format(largest_order.id,
-                                                                                          dollar_amount))
+            print("Largest order dollar amount has id \"{}\". Value is {} dollars".format(largest_order.key,
+                                                                                          largest_order.value))
 
     def _print_state_with_most_orders(self):
         # I think that only sold orders should be taken into account
-        state_order_count = {}
-        for order in list(filter(lambda o: o.is_sold(), self.orders)):
-            count = state_order_count.setdefault(order.address.state, 0)
-            state_order_count[order.address.state] = count + 1
-        state_with_most, state_count = self._sort_and_get_first(state_order_count, True)
+        state_with_most, state_count = self.metrics.state_with_most_orders()
         if state_with_most is None:
             print("No orders sold yet")
         else:
@@ -446,34 +446,19 @@ class OrderProcessor:
 
     def _print_biggest_order_by_quantity(self):
         # I think that only sold orders should be taken into account
-        order_item_quantity = {}
-        for order in list(filter(lambda o: o.is_sold(), self.orders)):
-            order_item_quantity[order] = order.calculate_items_quantity()
-        biggest_order, quantity = self._sort_and_get_first(order_item_quantity, True)
-        if biggest_order is None:
+        biggest_order = self.metrics.biggest_order_by_quantity
+        if biggest_order.key is None:
             print("No orders sold yet")
         else:
-            print("Largest order by items quantity has id \"{}\". Quantity is {} units".format(biggest_order.id,
-                                                                                               quantity))
+            print("Largest order by items quantity has id \"{}\". Quantity is {} units".format(biggest_order.key,
+                                                                                               biggest_order.value))
 
     def _print_ratio_of_cancelled_orders(self):
-        total_orders = len(self.orders)
-        canceled_orders = len(list(filter(lambda o: o.is_canceled(), self.orders)))
-        if total_orders == 0:
+        if self.metrics.total_orders == 0:
             print("No orders found")
         else:
             print("Total number of orders is {}. Canceled orders number is {}. The ratio is {}".format(
-                total_orders, canceled_orders, canceled_orders/total_orders * 1.0))
-
-    # noinspection PyMethodMayBeStatic
-    def _sort_and_get_first(self, obj_dict: Dict[Any, Any], reverse=False) -> Tuple[Optional[Any], Any]:
-        if not obj_dict:
-            return None, None
-        else:
-            objs = list(obj_dict.keys())
-            counts = list(obj_dict.values())
-            idx = sorted(range(0, len(objs)), key=counts.__getitem__, reverse=reverse)[0]
-            return objs[idx], counts[idx]
+                self.metrics.total_orders, self.metrics.canceled_orders, self.metrics.cancel_ratio))
 
 
 if __name__ == "__main__":
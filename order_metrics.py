@@ -0,0 +1,188 @@
+from datetime import date, timedelta
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class SpaceSavingTopK:
+    """Space-Saving heavy hitters sketch keeping at most `capacity` counters."""
+
+    def __init__(self, capacity: int = 32):
+        if capacity <= 0:
+            print("Invalid top-k capacity: {}".format(capacity))
+            raise ValueError(capacity)
+        self.capacity = capacity
+        self._counts: Dict[Hashable, int] = {}
+        self._errors: Dict[Hashable, int] = {}
+
+    def add(self, key: Hashable, weight: int = 1):
+        if key in self._counts:
+            self._counts[key] += weight
+        elif len(self._counts) < self.capacity:
+            self._counts[key] = weight
+            self._errors[key] = 0
+        else:
+            # Evict the smallest counter and let the new key inherit its count as error
+            min_key = min(self._counts, key=self._counts.__getitem__)
+            min_count = self._counts.pop(min_key)
+            self._errors.pop(min_key)
+            self._counts[key] = min_count + weight
+            self._errors[key] = min_count
+
+    def merge(self, other: "SpaceSavingTopK") -> "SpaceSavingTopK":
+        # Keys missing from a full summary may have been counted up to its minimum
+        self_min = self._min_count()
+        other_min = other._min_count()
+        merged = SpaceSavingTopK(max(self.capacity, other.capacity))
+        counts = {}
+        errors = {}
+        for key in set(self._counts) | set(other._counts):
+            counts[key] = self._counts.get(key, self_min) + other._counts.get(key, other_min)
+            errors[key] = self._errors.get(key, self_min) + other._errors.get(key, other_min)
+        for key in sorted(counts, key=counts.__getitem__, reverse=True)[:merged.capacity]:
+            merged._counts[key] = counts[key]
+            merged._errors[key] = errors[key]
+        return merged
+
+    def top(self, k: int = 1) -> List[Tuple[Hashable, int]]:
+        return sorted(self._counts.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def first(self) -> Tuple[Optional[Hashable], Optional[int]]:
+        top = self.top(1)
+        if not top:
+            return None, None
+        return top[0]
+
+    def error(self, key: Hashable) -> int:
+        return self._errors.get(key, self._min_count())
+
+    def _min_count(self) -> int:
+        if len(self._counts) < self.capacity:
+            return 0
+        return min(self._counts.values())
+
+
+class _RunningMax:
+
+    def __init__(self):
+        self.key: Optional[Hashable] = None
+        self.value = None
+
+    def add(self, key: Hashable, value):
+        if self.value is None or value > self.value:
+            self.key = key
+            self.value = value
+
+    def merge(self, other: "_RunningMax") -> "_RunningMax":
+        merged = _RunningMax()
+        if self.value is not None:
+            merged.add(self.key, self.value)
+        if other.value is not None:
+            merged.add(other.key, other.value)
+        return merged
+
+
+class OrderMetricsAggregator:
+    """Online order metrics, mergeable across shards.
+
+    Orders are fed one at a time with `add_order`; only sold orders contribute to the sale metrics.
+    An order that becomes sold after being added (e.g. once accepted) is reported with `add_sale`.
+    Product option counts are exact while the number of distinct options stays within `top_k_capacity`.
+    """
+
+    def __init__(self, top_k_capacity: int = 32):
+        self.total_orders = 0
+        self.canceled_orders = 0
+        self.sold_orders = 0
+        self.dollar_amount = 0.0
+        self.items_quantity = 0
+        self.largest_order_dollar_amount = _RunningMax()
+        self.biggest_order_by_quantity = _RunningMax()
+        self.product_options_sold = SpaceSavingTopK(top_k_capacity)
+        # States are a small fixed set, so they are counted exactly
+        self.states_sold: Dict[str, int] = {}
+
+    def add_order(self, order):
+        self.total_orders += 1
+        if order.is_canceled():
+            self.canceled_orders += 1
+        if order.is_sold():
+            self.add_sale(order)
+
+    def add_sale(self, order):
+        self.sold_orders += 1
+        dollar_amount = order.calculate_order_dollar_amount()
+        quantity = order.calculate_items_quantity()
+        self.dollar_amount += dollar_amount
+        self.items_quantity += quantity
+        self.largest_order_dollar_amount.add(order.id, dollar_amount)
+        self.biggest_order_by_quantity.add(order.id, quantity)
+        for order_item in order.items_dict.values():
+            self.product_options_sold.add((order_item.product_id, order_item.product_option_id),
+                                          order_item.quantity)
+        self.states_sold[order.address.state] = self.states_sold.get(order.address.state, 0) + 1
+
+    def state_with_most_orders(self) -> Tuple[Optional[str], Optional[int]]:
+        if not self.states_sold:
+            return None, None
+        state = max(self.states_sold, key=self.states_sold.__getitem__)
+        return state, self.states_sold[state]
+
+    @property
+    def cancel_ratio(self) -> Optional[float]:
+        if self.total_orders == 0:
+            return None
+        return self.canceled_orders / self.total_orders * 1.0
+
+    def merge(self, other: "OrderMetricsAggregator") -> "OrderMetricsAggregator":
+        merged = OrderMetricsAggregator(max(self.product_options_sold.capacity, other.product_options_sold.capacity))
+        merged.total_orders = self.total_orders + other.total_orders
+        merged.canceled_orders = self.canceled_orders + other.canceled_orders
+        merged.sold_orders = self.sold_orders + other.sold_orders
+        merged.dollar_amount = self.dollar_amount + other.dollar_amount
+        merged.items_quantity = self.items_quantity + other.items_quantity
+        merged.largest_order_dollar_amount = self.largest_order_dollar_amount.merge(
+            other.largest_order_dollar_amount)
+        merged.biggest_order_by_quantity = self.biggest_order_by_quantity.merge(other.biggest_order_by_quantity)
+        merged.product_options_sold = self.product_options_sold.merge(other.product_options_sold)
+        merged.states_sold = dict(self.states_sold)
+        for state, count in other.states_sold.items():
+            merged.states_sold[state] = merged.states_sold.get(state, 0) + count
+        return merged
+
+
+class RollingOrderMetrics:
+    """Order metrics over the last `window_days` days, kept as one aggregator per `created_at` day."""
+
+    def __init__(self, window_days: int, top_k_capacity: int = 32):
+        if window_days <= 0:
+            print("Invalid rolling window days: {}".format(window_days))
+            raise ValueError(window_days)
+        self.window_days = window_days
+        self.top_k_capacity = top_k_capacity
+        self._buckets: Dict[date, OrderMetricsAggregator] = {}
+
+    def add_order(self, order):
+        bucket = self._get_bucket(order)
+        if bucket is not None:
+            bucket.add_order(order)
+
+    def add_sale(self, order):
+        bucket = self._get_bucket(order)
+        if bucket is not None:
+            bucket.add_sale(order)
+
+    def metrics(self) -> OrderMetricsAggregator:
+        merged = OrderMetricsAggregator(self.top_k_capacity)
+        for bucket in self._buckets.values():
+            merged = merged.merge(bucket)
+        return merged
+
+    def _get_bucket(self, order) -> Optional[OrderMetricsAggregator]:
+        day = order.date_time.date()
+        if self._buckets and day <= max(self._buckets) - timedelta(days=self.window_days):
+            # Order is older than the window
+            return None
+        bucket = self._buckets.setdefault(day, OrderMetricsAggregator(self.top_k_capacity))
+        oldest_day = day - timedelta(days=self.window_days)
+        for bucket_day in [d for d in self._buckets if d <= oldest_day]:
+            del self._buckets[bucket_day]
+        return bucket
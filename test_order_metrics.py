@@ -0,0 +1,161 @@
+import unittest
+from collections import Counter
+from datetime import datetime
+from types import SimpleNamespace
+
+from order_metrics import OrderMetricsAggregator, RollingOrderMetrics, SpaceSavingTopK, _RunningMax
+
+
+def _order(order_id, state, sold=True, canceled=False, items=(), created_at=datetime(2020, 1, 1)):
+    items_dict = {n: SimpleNamespace(product_id="p", product_option_id=po, quantity=q, price_cents=100)
+                  for n, (po, q) in enumerate(items)}
+    return SimpleNamespace(id=order_id, date_time=created_at, items_dict=items_dict,
+                           address=SimpleNamespace(state=state),
+                           is_sold=lambda: sold, is_canceled=lambda: canceled,
+                           calculate_order_dollar_amount=lambda: sum(q for _, q in items) * 1.0,
+                           calculate_items_quantity=lambda: sum(q for _, q in items))
+
+
+class SpaceSavingTopKTest(unittest.TestCase):
+
+    def _assert_bounds(self, sketch, exact):
+        for key, count in sketch.top(sketch.capacity):
+            self.assertLessEqual(count - sketch.error(key), exact[key])
+            self.assertGreaterEqual(count, exact[key])
+        for key in set(exact) - set(k for k, _ in sketch.top(sketch.capacity)):
+            self.assertLessEqual(exact[key], sketch.error(key))
+
+    def test_add_within_capacity_is_exact(self):
+        sketch = SpaceSavingTopK(3)
+        for key in "abacab":
+            sketch.add(key)
+        sketch.add("c", 5)
+        self.assertEqual([("c", 6), ("a", 3), ("b", 2)], sketch.top(3))
+        self.assertEqual(0, sketch.error("a"))
+
+    def test_eviction_keeps_bounds(self):
+        stream = "aababcaadeffaagaabhh"
+        sketch = SpaceSavingTopK(3)
+        for key in stream:
+            sketch.add(key)
+        self.assertEqual(3, len(sketch.top(10)))
+        self.assertEqual("a", sketch.first()[0])
+        self._assert_bounds(sketch, Counter(stream))
+
+    def test_invalid_capacity(self):
+        with self.assertRaises(ValueError):
+            SpaceSavingTopK(0)
+
+    def test_merge_non_full_matches_single_stream(self):
+        left, right, single = SpaceSavingTopK(5), SpaceSavingTopK(5), SpaceSavingTopK(5)
+        for key in "aabc":
+            left.add(key)
+            single.add(key)
+        for key in "bbd":
+            right.add(key)
+            single.add(key)
+        merged = left.merge(right)
+        self.assertEqual(sorted(single.top(5)), sorted(merged.top(5)))
+        self.assertEqual(0, merged.error("a"))
+
+    def test_merge_full_keeps_bounds(self):
+        left_stream, right_stream = "aaabbcdde", "eeeffbbga"
+        left, right = SpaceSavingTopK(3), SpaceSavingTopK(3)
+        for key in left_stream:
+            left.add(key)
+        for key in right_stream:
+            right.add(key)
+        merged = left.merge(right)
+        self.assertEqual(3, len(merged.top(10)))
+        self._assert_bounds(merged, Counter(left_stream + right_stream))
+
+    def test_merge_empty(self):
+        sketch = SpaceSavingTopK(2)
+        sketch.add("a", 2)
+        self.assertEqual([("a", 2)], sketch.merge(SpaceSavingTopK(2)).top(2))
+        self.assertEqual((None, None), SpaceSavingTopK(2).merge(SpaceSavingTopK(2)).first())
+
+
+class RunningMaxTest(unittest.TestCase):
+
+    def test_merge_with_empty_sides(self):
+        running_max = _RunningMax()
+        running_max.add("a", 3)
+        running_max.add("b", 1)
+        self.assertEqual(("a", 3), (running_max.key, running_max.value))
+        for merged in (running_max.merge(_RunningMax()), _RunningMax().merge(running_max)):
+            self.assertEqual(("a", 3), (merged.key, merged.value))
+        empty = _RunningMax().merge(_RunningMax())
+        self.assertEqual((None, None), (empty.key, empty.value))
+
+    def test_merge_keeps_largest(self):
+        left, right = _RunningMax(), _RunningMax()
+        left.add("a", 3)
+        right.add("b", 5)
+        merged = left.merge(right)
+        self.assertEqual(("b", 5), (merged.key, merged.value))
+
+
+class OrderMetricsAggregatorTest(unittest.TestCase):
+
+    def test_cancel_ratio_with_zero_orders(self):
+        self.assertIsNone(OrderMetricsAggregator().cancel_ratio)
+
+    def test_states_are_exact_above_capacity(self):
+        aggregator = OrderMetricsAggregator(top_k_capacity=2)
+        for n in range(50):
+            for _ in range(n % 3 + 1):
+                aggregator.add_order(_order(n, "S{}".format(n)))
+        self.assertEqual(50, len(aggregator.states_sold))
+        self.assertEqual(("S2", 3), aggregator.state_with_most_orders())
+
+    def test_merge_matches_single_stream(self):
+        orders = [_order(1, "NY", items=[("x", 3)]),
+                  _order(2, "CA", sold=False, canceled=True),
+                  _order(3, "CA", items=[("y", 1), ("x", 2)]),
+                  _order(4, "CA", items=[("y", 7)]),
+                  _order(5, "TX", sold=False)]
+        single, left, right = OrderMetricsAggregator(), OrderMetricsAggregator(), OrderMetricsAggregator()
+        for n, order in enumerate(orders):
+            single.add_order(order)
+            (left if n % 2 else right).add_order(order)
+        merged = left.merge(right)
+        for metrics in (single, merged):
+            self.assertEqual(5, metrics.total_orders)
+            self.assertEqual(3, metrics.sold_orders)
+            self.assertEqual(0.2, metrics.cancel_ratio)
+            self.assertEqual(13, metrics.items_quantity)
+            self.assertEqual(13.0, metrics.dollar_amount)
+            self.assertEqual((4, 7), (metrics.largest_order_dollar_amount.key,
+                                      metrics.largest_order_dollar_amount.value))
+            self.assertEqual((("p", "y"), 8), metrics.product_options_sold.first())
+            self.assertEqual({"NY": 1, "CA": 2}, metrics.states_sold)
+
+    def test_add_sale_after_add_order(self):
+        aggregator = OrderMetricsAggregator()
+        order = _order(1, "NY", sold=False, items=[("x", 2)])
+        aggregator.add_order(order)
+        aggregator.add_sale(order)
+        self.assertEqual((1, 1), (aggregator.total_orders, aggregator.sold_orders))
+        self.assertEqual((("p", "x"), 2), aggregator.product_options_sold.first())
+
+
+class RollingOrderMetricsTest(unittest.TestCase):
+
+    def test_drops_days_outside_window(self):
+        rolling = RollingOrderMetrics(window_days=2)
+        rolling.add_order(_order(1, "NY", created_at=datetime(2020, 1, 1)))
+        rolling.add_order(_order(2, "CA", created_at=datetime(2020, 1, 2)))
+        rolling.add_order(_order(3, "CA", created_at=datetime(2020, 1, 3)))
+        rolling.add_order(_order(4, "TX", created_at=datetime(2020, 1, 1)))
+        metrics = rolling.metrics()
+        self.assertEqual(2, metrics.total_orders)
+        self.assertEqual({"CA": 2}, metrics.states_sold)
+
+    def test_invalid_window(self):
+        with self.assertRaises(ValueError):
+            RollingOrderMetrics(0)
+
+
+if __name__ == "__main__":
+    unittest.main()